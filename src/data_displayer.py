@@ -1,12 +1,17 @@
 from src.database_manager import DatabaseManager
 
+from array import array
 from datetime import datetime
+from itertools import islice
 from rich.console import Console
-from rich.tree import Tree
 from rich.panel import Panel
+from rich.text import Text
 
 from src.models import Comment, Thread
 
+# Number of threads whose comments are fetched together in a single query
+THREAD_BATCH_SIZE = 500
+
 
 class DataDisplayer:
     """Class for displaying data from the database"""
@@ -16,7 +21,11 @@ class DataDisplayer:
         self.console = Console()
 
     def display_subreddit_threads(
-        self, subreddit_name: str, start_date: datetime
+        self,
+        subreddit_name: str,
+        start_date: datetime,
+        max_threads: int | None = None,
+        expand_comments: bool = True,
     ) -> None:
         """
         Main function to retrieve and display threads/comments from a specific subreddit,
@@ -25,6 +34,8 @@ class DataDisplayer:
         Args:
             subreddit_name: Subreddit name to fetch threads from
             start_date: Start date to fetch threads from
+            max_threads: Maximum number of threads to display, most recent first, or None for all of them
+            expand_comments: Whether to fetch and display the comments of each thread
         """
         with self.database as database:
             subreddit_id = database.get_subreddit_id(subreddit_name)
@@ -36,28 +47,45 @@ class DataDisplayer:
                 )
                 return
 
-            # Fetch threads from the database
-            threads = database.get_threads(subreddit_id, start_date)
-
-            # If no threads were found, then log a message and return
-            if not threads:
+            # Stream threads from the database
+            threads = database.get_threads(subreddit_id, start_date, max_threads)
+
+            # Display the threads and their comments, one batch of threads at a time so that
+            # each batch's comments are fetched in one query. Each batch's rendered output is
+            # captured and written out in one go rather than flushed to the terminal print by print
+            found_threads = False
+            while thread_batch := list(islice(threads, THREAD_BATCH_SIZE)):
+                found_threads = True
+
+                # Comments are only queried when they will be displayed
+                comments_by_thread = (
+                    database.get_comments_bulk([thread.id for thread in thread_batch])
+                    if expand_comments
+                    else {}
+                )
+                with self.console.capture() as capture:
+                    for thread in thread_batch:
+                        self.display_thread(
+                            thread, comments_by_thread.get(thread.id, [])
+                        )
+                        self.console.print("\n\n")
+                self.console.file.write(capture.get())
+                self.console.file.flush()
+
+            # If no threads were found, then log a message
+            if not found_threads:
                 self.console.log(
                     f"[yellow]No threads found for subreddit '{subreddit_name}' since {start_date}.[/yellow]"
                 )
-                return
-
-            # Display the threads and their comments
-            for thread in threads:
-                self.display_thread(thread)
-                self.console.print("\n\n")
 
-    def display_thread(self, thread: Thread) -> None:
+    def display_thread(self, thread: Thread, comments: list[Comment]) -> None:
         """
         Displays a thread and its associated comments into the console.
         Thread information is displayed in a panel with the comments below it.
 
         Args:
             thread: A dictionary containing the thread data
+            comments: A list of the thread's comments, in chronological order
         """
         panel_title = f"{thread.title} (by {thread.username})"
         panel_content = (
@@ -78,34 +106,48 @@ class DataDisplayer:
 
         self.console.print(Panel(panel_content, title=panel_title, expand=True))
 
-        # Retrieve and display comments
-        comments = self.database.get_comments(thread.id)
+        # Display comments
         if comments:
             self.display_comments(comments)
 
     def display_comments(self, comments: list[Comment]) -> None:
         """
-        Displays comments in a hierarchical tree structure in the console.
-        Hierarchy is determined by the parent_comment_id of each comment.
+        Displays comments in a hierarchical structure in the console, each reply indented
+        under its parent. Hierarchy is determined by the parent_comment_id of each comment.
         Assumes that comments are processed in chronological order.
 
         Args:
             comments: A list of dictionaries containing the comment data
         """
-
-        comment_tree = Tree("[bold]Comments:[/bold]")
-        comment_dict = {None: comment_tree}
-
-        for comment in comments:
-            comment_text = (
-                f"{comment.username} (Upvotes: {comment.upvotes})\n"
-                f"[italic]{comment.date_posted}[/italic]\n"
-                f"{comment.text}"
+        # Resolve each comment's parent to its position in the list (-1 for top level, which
+        # also covers comments whose parent is missing), then index the replies of each comment
+        index_of = {comment.id: index for index, comment in enumerate(comments)}
+        parents = array(
+            "i", (index_of.get(comment.parent_comment_id, -1) for comment in comments)
+        )
+        roots: list[int] = []
+        children: list[list[int]] = [[] for _ in comments]
+        for index, parent in enumerate(parents):
+            (children[parent] if parent >= 0 else roots).append(index)
+
+        # Walk the hierarchy depth-first, indenting each comment by its depth. Comment text is
+        # appended as plain text so that it is never parsed as markup; only the date is styled
+        body = Text()
+        stack = [(index, 0) for index in reversed(roots)]
+        while stack:
+            index, depth = stack.pop()
+            comment = comments[index]
+            indent = "    " * depth
+            body.append(f"{indent}{comment.username} (Upvotes: {comment.upvotes})\n")
+            body.append(f"{indent}{comment.date_posted}", style="italic")
+            body.append("\n")
+            body.append(
+                "".join(
+                    f"{indent}{line}\n" for line in (comment.text or "").split("\n")
+                )
             )
-            if comment.parent_comment_id:
-                parent_node = comment_dict.get(comment.parent_comment_id)
-                comment_dict[comment.id] = parent_node.add(comment_text)
-            else:
-                comment_dict[comment.id] = comment_tree.add(comment_text)
+            body.append("\n")
+            stack.extend((reply, depth + 1) for reply in reversed(children[index]))
 
-        self.console.print(comment_tree)
+        body.rstrip()
+        self.console.print(Panel(body, title="[bold]Comments[/bold]", expand=True))
@@ -1,9 +1,13 @@
 from src.database_manager import DatabaseManager
 
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import praw
+import prawcore
 import logging
+import threading
+import time
 
 from src.models import Thread, Subreddit, Comment
 
@@ -15,6 +19,51 @@ import praw.models.reddit.more
 
 logger = logging.getLogger(__name__)
 
+# Number of threads parsed concurrently within a batch. PRAW is not thread-safe, so each
+# worker makes its requests through its own praw.Reddit instance
+MAX_WORKERS = 8
+
+# Requests per minute shared by all workers. Reddit allows 100 per minute per client ID,
+# and the workers' instances each rate limit on their own, so they are paced together here.
+# Kept below the limit to leave room for the main instance's listing requests
+WORKER_REQUESTS_PER_MINUTE = 90
+
+
+class RequestPacer:
+    """
+    Thread-safe limiter that spaces out requests evenly, no matter which thread makes them.
+    """
+
+    def __init__(self, requests_per_minute: int) -> None:
+        self.interval = 60 / requests_per_minute
+        self._lock = threading.Lock()
+        self._next_request_time = 0.0
+
+    def wait(self) -> None:
+        """
+        Blocks the calling thread until it is its turn to make a request.
+        """
+        with self._lock:
+            now = time.monotonic()
+            request_time = max(now, self._next_request_time)
+            self._next_request_time = request_time + self.interval
+        time.sleep(request_time - now)
+
+
+class PacedRequestor(prawcore.Requestor):
+    """
+    Requestor that waits on a shared RequestPacer before every HTTP request, including the
+    ones made while replacing "more comments" and refreshing tokens.
+    """
+
+    def __init__(self, *args, pacer: RequestPacer, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.pacer = pacer
+
+    def request(self, *args, **kwargs):
+        self.pacer.wait()
+        return super().request(*args, **kwargs)
+
 
 class DataIngestor:
     """
@@ -23,6 +72,9 @@ class DataIngestor:
 
     def __init__(self, reddit: praw.Reddit) -> None:
         self.reddit = reddit
+        self._subreddits: dict[str, praw.models.Subreddit] = {}
+        self._worker_state = threading.local()
+        self._worker_pacer = RequestPacer(WORKER_REQUESTS_PER_MINUTE)
 
     def ingest_data_into_database(
         self,
@@ -50,86 +102,159 @@ class DataIngestor:
     ) -> None:
         """
         Fetches threads from the given subreddit since the start_date in batches. Iterates through each batch,
-        parses through each thread and insert them into the database, one by one.
+        parses its threads concurrently and inserts the whole batch into the database at once.
         Args:
             subreddit_name: Name of the subreddit to fetch threads from
             start_date: Start date to fetch threads from
             database: DatabaseManager instance to use for data insertion
         """
 
-        def helper(thread: praw.models.reddit.submission.Submission) -> None:
+        def helper(threads: list[Thread]) -> None:
             """
-            Calls helper methods to parse through the given thread and insert its
-            data into the database.
+            Inserts a batch of parsed threads and all of their comments into the database.
+            Threads are inserted first since comments reference them.
 
             Args:
-                thread: An individual thread object fetched from the reddit API
+                threads: A list of parsed Thread objects
             """
-            parsed_thread = self.parse_thread(thread)
-            database.insert_thread_data(parsed_thread)
-            database.insert_comment_data(parsed_thread.comments)
+            database.insert_thread_data(threads)
+            database.insert_comment_data(
+                [comment for thread in threads for comment in thread.comments]
+            )
 
         # Get subreddit object from the reddit API. Parse through its data and insert it into the database
-        subreddit = self.reddit.subreddit(subreddit_name)
-        subreddit_data = self.parse_subreddit(subreddit_name)
+        subreddit = self.get_subreddit(subreddit_name)
+        subreddit_data = self.parse_subreddit(subreddit)
         database.insert_subreddit_data(subreddit_data)
 
-        # Fetch threads in batches (100 threads at a time) and process/ingest each.
-        # We break out of the loop if we come across a thread that is older than the start_date or
+        # Fetch threads in batches (100 threads at a time), parse each and ingest the batch.
+        # We stop once we come across a thread that is older than the start_date or
         # if there are no more threads to fetch.
+        # The worker pool lives for the whole run so each worker keeps its reddit instance
         last_thread = None
-        while True:
-            batch = subreddit.new(limit=100, params={"after": last_thread})
-            if not batch:
-                return
-            for thread in batch:
-                logger.info(f"Processing thread: {thread.title}")
-                if datetime.fromtimestamp(thread.created_utc) < start_date:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            while True:
+                batch = list(subreddit.new(limit=100, params={"after": last_thread}))
+                if not batch:
+                    return
+
+                # Keep the threads posted since the start_date
+                thread_ids = []
+                reached_start_date = False
+                for thread in batch:
+                    if datetime.fromtimestamp(thread.created_utc) < start_date:
+                        reached_start_date = True
+                        break
+                    thread_ids.append(thread.id)
+                    last_thread = thread.fullname  # Necessary to fetch the next batch
+
+                # Parse the threads (and fetch their comments) concurrently. Insertion stays serial,
+                # as the database connection is not thread-safe
+                parsed_threads = list(
+                    executor.map(
+                        lambda thread_id: self.parse_thread_in_worker(
+                            thread_id, subreddit_data.id
+                        ),
+                        thread_ids,
+                    )
+                )
+
+                helper(parsed_threads)
+                if reached_start_date:
                     return
-                helper(thread)
-                last_thread = thread.fullname  # Necessary to fetch the next batch
 
-    def parse_subreddit(self, subreddit_name: str) -> Subreddit:
+    def get_worker_reddit(self) -> praw.Reddit:
+        """
+        Returns the reddit instance of the calling worker thread, creating it on first use
+        with the same credentials as the main instance. PRAW instances are not thread-safe,
+        so workers never share one, but all of them share one RequestPacer so that together
+        they stay within the rate limit of the client ID.
+
+        Returns:
+            A reddit instance owned by the calling thread
+        """
+        if not hasattr(self._worker_state, "reddit"):
+            config = self.reddit.config
+            self._worker_state.reddit = praw.Reddit(
+                client_id=config.client_id,
+                client_secret=config.client_secret,
+                user_agent=config.user_agent,
+                requestor_class=PacedRequestor,
+                requestor_kwargs={"pacer": self._worker_pacer},
+            )
+        return self._worker_state.reddit
+
+    def parse_thread_in_worker(self, thread_id: str, subreddit_id: str) -> Thread:
+        """
+        Fetches the given thread through the calling worker's own reddit instance and parses it.
+
+        Args:
+            thread_id: ID of the thread to fetch and parse
+            subreddit_id: ID of the subreddit the thread belongs to
+
+        Returns:
+            A Thread object
+        """
+        thread = self.get_worker_reddit().submission(id=thread_id)
+        return self.parse_thread(thread, subreddit_id)
+
+    def get_subreddit(self, subreddit_name: str) -> praw.models.Subreddit:
+        """
+        Returns the subreddit object for the given name, reusing the one created on a previous
+        call so that its lazily fetched attributes are only requested from the reddit API once.
+
+        Args:
+            subreddit_name: Name of the subreddit
+
+        Returns:
+            The subreddit object
+        """
+        if subreddit_name not in self._subreddits:
+            self._subreddits[subreddit_name] = self.reddit.subreddit(subreddit_name)
+        return self._subreddits[subreddit_name]
+
+    def parse_subreddit(self, subreddit: praw.models.Subreddit) -> Subreddit:
         """
         Fetches subreddit data from the given subreddit and encapsulates the relevant
         data in a Subreddit dataclass object.
 
         Args:
-            subreddit_name: Name of the subreddit to fetch threads from
+            subreddit: The subreddit object fetched from the reddit API
 
         Returns:
             A Subreddit object
         """
-        subreddit = self.reddit.subreddit(subreddit_name)
-
         return Subreddit(
             id=subreddit.id,
             name=subreddit.display_name,
         )
 
-    def parse_thread(self, thread: praw.models.reddit.submission.Submission) -> Thread:
+    def parse_thread(
+        self, thread: praw.models.reddit.submission.Submission, subreddit_id: str
+    ) -> Thread:
         """
         Parses through the given thread object and encapsulates the relevant
         data in a Thread dataclass object.
+        Runs on worker threads, so it must not touch the database or the shared reddit instance.
 
         Args:
             thread: An individual thread object fetched from the reddit API
+            subreddit_id: ID of the subreddit the thread belongs to
 
         Returns:
             A Thread object
         """
+        logger.info(f"Processing thread: {thread.title}")
         parsed_thread = Thread(
             id=thread.id,
-            subreddit_id=thread.subreddit.id,
+            subreddit_id=subreddit_id,
             title=thread.title,
             text=thread.selftext,
             external_url=thread.url if not thread.is_self else None,
             url=f"https://reddit.com{thread.permalink}",
             username=thread.author.name if thread.author else None,
             upvotes=thread.score,
-            date_posted=datetime.fromtimestamp(thread.created_utc).strftime(
-                "%Y-%m-%d %H:%M:%S"
-            ),
+            date_posted=datetime.fromtimestamp(thread.created_utc),
             comments=self.parse_comments(thread),
         )
         return parsed_thread
@@ -177,9 +302,7 @@ class DataIngestor:
             parent_comment_id=self.get_parent_comment_id(comment),
             username=comment.author.name if comment.author else None,
             upvotes=comment.score,
-            date_posted=datetime.fromtimestamp(comment.created_utc).strftime(
-                "%Y-%m-%d %H:%M:%S"
-            ),
+            date_posted=datetime.fromtimestamp(comment.created_utc),
             text=comment.body,
         )
 
@@ -1,51 +1,104 @@
-import pymysql
 import datetime
-import pymysql.cursors
+import logging
+import os
+import tempfile
+from collections import defaultdict
+from typing import Iterator
 
 from src.models import Thread, Subreddit, Comment
 
+# Prefer the C-based mysqlclient driver when it is installed (the `mysqlclient` extra),
+# falling back to pure-Python PyMySQL. Both expose the same DB-API surface used here
+try:
+    import MySQLdb as mysql_driver
+    import MySQLdb.cursors as mysql_cursors
+except ImportError:
+    import pymysql as mysql_driver
+    import pymysql.cursors as mysql_cursors
+
+# Number of rows turned into model objects at a time when streaming query results
+FETCH_SIZE = 500
+
+# When bulk loading is enabled, comment batches larger than this are loaded with
+# LOAD DATA LOCAL INFILE rather than a multi-row INSERT
+BULK_LOAD_THRESHOLD = 500
+
+# Error codes raised when LOAD DATA LOCAL INFILE is disabled on the server or the client
+LOCAL_INFILE_DISABLED_ERRORS = (1148, 2068, 3948)
+
+logger = logging.getLogger(__name__)
+
 
 class DatabaseManager:
     """
-    Manages interactions with the MySQL database using PyMySQL.
+    Manages interactions with the MySQL database using mysqlclient, or PyMySQL if it is not installed.
+    Queries must run inside a `with` block, which provides the shared cursor.
     """
 
-    def __init__(self, host, user, password, database):
+    def __init__(self, host, user, password, database, bulk_load=False):
         self.host = host
         self.user = user
         self.password = password
         self.database_name = database
+        self.bulk_load = bulk_load
         self.connection = self.connect()
+        self.cursor: mysql_cursors.DictCursor | None = None
+        self._subreddit_id_cache: dict[str, str] = {}
 
-    def connect(self) -> pymysql.Connection:
+    def connect(self) -> mysql_driver.Connection:
         """
         Provides a connection to the MySQL database.
 
         Returns:
-            A connection to the MySQL database using PyMySQL
+            A connection to the MySQL database using the available driver
         """
-        return pymysql.connect(
+        return mysql_driver.connect(
             host=self.host,
             user=self.user,
             password=self.password,
             database=self.database_name,
-            cursorclass=pymysql.cursors.DictCursor,
+            charset="utf8mb4",
+            cursorclass=mysql_cursors.DictCursor,
+            # Lets the server read client files, so only allowed when bulk loading is opted into
+            local_infile=self.bulk_load,
         )
 
     def __enter__(self) -> "DatabaseManager":
         """
-        Upon entering, if a connection is not open, open one.
+        Upon entering, if a connection is not open, open one. An open connection is kept
+        and reconnected if the server dropped it. Opens the cursor shared by the queries
+        run inside the block.
 
         Returns:
             Self
         """
         if self.connection is None or self.connection.open is False:
             self.connection = self.connect()
+        else:
+            try:
+                self.connection.ping()
+            except mysql_driver.OperationalError:
+                self.connection = self.connect()
+        self.cursor = self.connection.cursor()
         return self
 
     def __exit__(self, exc_type, exc_value, traceback) -> None:
         """
-        Upon exiting, if a connection is open, close it.
+        Upon exiting, close the shared cursor and roll back any uncommitted work if an
+        exception was raised, dropping cached subreddit IDs that may not have been stored.
+        The connection stays open for the next block; call close() once it is no longer needed.
+        """
+        if self.cursor:
+            self.cursor.close()
+            self.cursor = None
+        if exc_type is not None:
+            self._subreddit_id_cache.clear()
+            if self.connection and self.connection.open:
+                self.connection.rollback()
+
+    def close(self) -> None:
+        """
+        Closes the connection if it is open.
         """
         if self.connection and self.connection.open:
             self.connection.close()
@@ -63,44 +116,62 @@ class DatabaseManager:
         VALUES (%s, %s)
         ON DUPLICATE KEY UPDATE name=%s
         """
-        with self.connection.cursor() as cursor:
-            cursor.execute(
-                insert_subreddit_data_query,
-                (subreddit.id, subreddit.name, subreddit.name),
-            )
+        self.cursor.execute(
+            insert_subreddit_data_query,
+            (subreddit.id, subreddit.name, subreddit.name),
+        )
+        self._subreddit_id_cache[subreddit.name] = subreddit.id
 
-    def insert_thread_data(self, thread: Thread) -> None:
+    def insert_thread_data(self, threads: list[Thread]) -> None:
         """
         Inserts or updates the thread data into the database.
 
         Args:
-            thread: The thread object to insert/update
+            threads: The list of thread objects to insert/update
         """
+        if not threads:
+            return
 
         insert_thread_query = """
         INSERT INTO threads (id, subreddit_id, title, text, external_url, url, username, upvotes, date_posted)
         VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        ON DUPLICATE KEY UPDATE upvotes=%s, title=%s, url=%s, text=%s
+        ON DUPLICATE KEY UPDATE upvotes=VALUES(upvotes), title=VALUES(title), url=VALUES(url), text=VALUES(text)
         """
-        with self.connection.cursor() as cursor:
-            cursor.execute(
-                insert_thread_query,
-                (
-                    thread.id,
-                    thread.subreddit_id,
-                    thread.title,
-                    thread.text,
-                    thread.external_url,
-                    thread.url,
-                    thread.username,
-                    thread.upvotes,
-                    thread.date_posted,
-                    thread.upvotes,
-                    thread.title,
-                    thread.url,
-                    thread.text,
-                ),
-            )
+
+        # Only threads already stored go through the upsert. New threads keep the
+        # ON DUPLICATE KEY clause in case the same thread appears twice in one batch or
+        # another run stores it between the lookup and the insert
+        existing_ids = self.get_existing_ids(
+            "threads", [thread.id for thread in threads]
+        )
+        params = [
+            _thread_row(thread) for thread in threads if thread.id not in existing_ids
+        ]
+        if params:
+            self.cursor.executemany(insert_thread_query, params)
+
+        existing_threads = [thread for thread in threads if thread.id in existing_ids]
+        if existing_threads:
+            self.update_thread_data(existing_threads)
+
+    def update_thread_data(self, threads: list[Thread]) -> None:
+        """
+        Updates the mutable fields of threads already stored in the database, as a compound
+        upsert rather than one UPDATE per thread.
+
+        Args:
+            threads: The list of thread objects to update
+        """
+        self.execute_values(
+            """
+            INSERT INTO threads (id, subreddit_id, title, text, external_url, url, username, upvotes, date_posted)
+            VALUES """,
+            "(%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+            [_thread_row(thread) for thread in threads],
+            """
+            ON DUPLICATE KEY UPDATE upvotes=VALUES(upvotes), title=VALUES(title), url=VALUES(url), text=VALUES(text)
+            """,
+        )
 
     def insert_comment_data(self, comments: list[Comment]) -> None:
         """
@@ -109,32 +180,193 @@ class DatabaseManager:
         Args:
             comments: The list of comment objects to insert/update
         """
+        if not comments:
+            return
+
+        if self.bulk_load and len(comments) > BULK_LOAD_THRESHOLD:
+            try:
+                self.bulk_load_comment_data(comments)
+                return
+            except mysql_driver.OperationalError as error:
+                if error.args[0] not in LOCAL_INFILE_DISABLED_ERRORS:
+                    raise
+                logger.warning(
+                    "LOAD DATA LOCAL INFILE is disabled, falling back to batched inserts."
+                )
+                self.bulk_load = False
+
         insert_comment_query = """
         INSERT INTO comments (id, parent_comment_id, thread_id, username, upvotes, date_posted, text)
         VALUES (%s, %s, %s, %s, %s, %s, %s)
-        ON DUPLICATE KEY UPDATE upvotes=%s, text=%s
+        ON DUPLICATE KEY UPDATE upvotes=VALUES(upvotes), text=VALUES(text)
         """
 
-        with self.connection.cursor() as cursor:
+        # Only comments already stored go through the upsert. New comments keep the
+        # ON DUPLICATE KEY clause in case of duplicates within the batch or a concurrent run.
+        # executemany rewrites the INSERT into a single multi-row statement
+        existing_ids = self.get_existing_ids(
+            "comments", [comment.id for comment in comments]
+        )
+        params = [
+            _comment_row(comment)
+            for comment in comments
+            if comment.id not in existing_ids
+        ]
+        if params:
+            self.cursor.executemany(insert_comment_query, params)
+
+        existing_comments = [
+            comment for comment in comments if comment.id in existing_ids
+        ]
+        if existing_comments:
+            self.update_comment_data(existing_comments)
+
+    def update_comment_data(self, comments: list[Comment]) -> None:
+        """
+        Updates the mutable fields of comments already stored in the database, as a compound
+        upsert rather than one UPDATE per comment.
+
+        Args:
+            comments: The list of comment objects to update
+        """
+        self.execute_values(
+            """
+            INSERT INTO comments (id, parent_comment_id, thread_id, username, upvotes, date_posted, text)
+            VALUES """,
+            "(%s, %s, %s, %s, %s, %s, %s)",
+            [_comment_row(comment) for comment in comments],
+            """
+            ON DUPLICATE KEY UPDATE upvotes=VALUES(upvotes), text=VALUES(text)
+            """,
+        )
+
+    def execute_values(
+        self,
+        query_prefix: str,
+        row_template: str,
+        rows: list[tuple],
+        query_suffix: str = "",
+    ) -> None:
+        """
+        Executes a statement over many rows of values, escaping each row client-side with mogrify
+        and joining them into as few compound statements as the cursor's maximum statement length
+        allows. Unlike executemany, this batches statements other than plain INSERTs, such as upserts
+        used as bulk updates.
+
+        Args:
+            query_prefix: The statement up to and including VALUES
+            row_template: The placeholder template of a single row, e.g. "(%s, %s)"
+            rows: The rows of parameters to fill the template with
+            query_suffix: The statement after the list of values
+        """
+        # max_stmt_length is in bytes, so lengths are measured on the encoded statement
+        base_length = len(query_prefix.encode()) + len(query_suffix.encode())
+        values: list[str] = []
+        length = base_length
+        for row in rows:
+            value = self.cursor.mogrify(row_template, row)
+            value_length = len(value.encode()) + 1
+            if values and length + value_length > self.cursor.max_stmt_length:
+                self.cursor.execute(query_prefix + ",".join(values) + query_suffix)
+                values = []
+                length = base_length
+            values.append(value)
+            length += value_length
+
+        if values:
+            self.cursor.execute(query_prefix + ",".join(values) + query_suffix)
+
+    def bulk_load_comment_data(self, comments: list[Comment]) -> None:
+        """
+        Inserts or updates a large batch of comment data into the database. The comments are written
+        to a temporary TSV file and loaded into a staging table with LOAD DATA LOCAL INFILE. Existing
+        comments are then refreshed with a single UPDATE joined on the staging table, and new ones are
+        inserted with a single INSERT ... SELECT.
+
+        Args:
+            comments: The list of comment objects to insert/update
+        """
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", newline="", suffix=".tsv", delete=False
+        ) as file:
             for comment in comments:
-                cursor.execute(
-                    insert_comment_query,
-                    (
-                        comment.id,
-                        comment.parent_comment_id,
-                        comment.thread_id,
-                        comment.username,
-                        comment.upvotes,
-                        comment.date_posted,
-                        comment.text,
-                        comment.upvotes,
-                        comment.text,
-                    ),
-                )
+                fields = _comment_row(comment)
+                file.write("\t".join(_to_tsv_field(field) for field in fields) + "\n")
+
+        try:
+            # The seq column keeps file order, so parent comments are inserted before their replies
+            self.cursor.execute(
+                """
+                CREATE TEMPORARY TABLE IF NOT EXISTS comments_staging (
+                    seq INT AUTO_INCREMENT PRIMARY KEY,
+                    id VARCHAR(255),
+                    parent_comment_id VARCHAR(255),
+                    thread_id VARCHAR(255),
+                    username VARCHAR(255),
+                    upvotes INT,
+                    date_posted DATETIME,
+                    text TEXT
+                ) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
+            """
+            )
+            self.cursor.execute("DELETE FROM comments_staging")
+            self.cursor.execute(
+                """
+                LOAD DATA LOCAL INFILE %s INTO TABLE comments_staging
+                CHARACTER SET utf8mb4
+                FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n'
+                (id, parent_comment_id, thread_id, username, upvotes, date_posted, text)
+            """,
+                (file.name,),
+            )
+            # Refresh the comments already stored, then insert the new ones
+            self.cursor.execute(
+                """
+                UPDATE comments JOIN comments_staging ON comments.id = comments_staging.id
+                SET comments.upvotes = comments_staging.upvotes, comments.text = comments_staging.text
+            """
+            )
+            self.cursor.execute(
+                """
+                INSERT INTO comments (id, parent_comment_id, thread_id, username, upvotes, date_posted, text)
+                SELECT staged.id, staged.parent_comment_id, staged.thread_id, staged.username,
+                    staged.upvotes, staged.date_posted, staged.text
+                FROM comments_staging AS staged
+                LEFT JOIN comments AS existing ON existing.id = staged.id
+                WHERE existing.id IS NULL
+                ORDER BY staged.seq
+                ON DUPLICATE KEY UPDATE upvotes=VALUES(upvotes), text=VALUES(text)
+            """
+            )
+        finally:
+            os.remove(file.name)
+
+    def get_existing_ids(self, table: str, ids: list[str]) -> set[str]:
+        """
+        Retrieves which of the given IDs are already stored in a table, looking them up
+        FETCH_SIZE at a time to keep each query well below max_allowed_packet.
+
+        Args:
+            table: The name of the table to check
+            ids: The IDs to look up
+
+        Returns:
+            The set of IDs found in the table
+        """
+        existing_ids = set()
+        for start in range(0, len(ids), FETCH_SIZE):
+            chunk = ids[start : start + FETCH_SIZE]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            self.cursor.execute(
+                f"SELECT id FROM {table} WHERE id IN ({placeholders})", chunk
+            )
+            existing_ids.update(row["id"] for row in self.cursor.fetchall())
+        return existing_ids
 
     def get_subreddit_id(self, subreddit_name: str) -> str | None:
         """
         Retrieves the subreddit ID from the database based on the subreddit name.
+        IDs found are cached, as a subreddit's ID never changes.
 
         Args:
             subreddit_name: The name of the subreddit
@@ -142,56 +374,141 @@ class DatabaseManager:
         Returns:
             String of the subreddit ID if found, else None
         """
-        with self.connection.cursor() as cursor:
-            cursor.execute(
-                "SELECT id FROM subreddits WHERE name = %s", (subreddit_name,)
-            )
-            result = cursor.fetchone()
-            return result["id"] if result else None
+        if subreddit_name in self._subreddit_id_cache:
+            return self._subreddit_id_cache[subreddit_name]
+
+        self.cursor.execute(
+            "SELECT id FROM subreddits WHERE name = %s", (subreddit_name,)
+        )
+        result = self.cursor.fetchone()
+        if not result:
+            return None
 
-    def get_threads(self, subreddit_id: str, start_date: datetime.date) -> list[Thread]:
+        self._subreddit_id_cache[subreddit_name] = result["id"]
+        return result["id"]
+
+    def get_threads(
+        self, subreddit_id: str, start_date: datetime.date, limit: int | None = None
+    ) -> Iterator[Thread]:
         """
         Retrieves all rows of thread data from the database based on the subreddit ID and start date.
+        Threads are yielded one at a time as rows are fetched.
 
         Args:
             subreddit_id: The ID of the subreddit
             start_date: The start date to fetch threads from
+            limit: Maximum number of threads to fetch, or None for all of them
 
-        Returns:
-            A list of threads fetched from the database
+        Yields:
+            Threads fetched from the database, most recent first
+        """
+        # Uses its own cursor, as other queries may run on the shared one while the results are consumed
+        query = """
+            SELECT id, subreddit_id, title, text, url, external_url, username, upvotes, date_posted 
+            FROM threads 
+            WHERE subreddit_id = %s AND date_posted >= %s
+            ORDER BY date_posted DESC
         """
+        params: tuple = (subreddit_id, start_date)
+        if limit is not None:
+            query += " LIMIT %s"
+            params += (limit,)
+
         with self.connection.cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT id, subreddit_id, title, text, url, external_url, username, upvotes, date_posted 
-                FROM threads 
-                WHERE subreddit_id = %s AND date_posted >= %s
-                ORDER BY date_posted DESC
-            """,
-                (subreddit_id, start_date),
-            )
-            threads = [Thread(**row) for row in cursor.fetchall()]
-            return threads
+            cursor.execute(query, params)
+            while rows := cursor.fetchmany(FETCH_SIZE):
+                yield from (Thread(**row) for row in rows)
 
-    def get_comments(self, thread_id: str) -> list[Comment]:
+    def get_comments_bulk(self, thread_ids: list[str]) -> dict[str, list[Comment]]:
         """
-        Retrieves all rows of comment data from the database based on the thread.
+        Retrieves all rows of comment data for several threads in a single query,
+        grouped by thread.
 
         Args:
-            thread_id: The ID of the thread the comments belong to.
+            thread_ids: The IDs of the threads the comments belong to.
 
         Returns:
-            A list of comments fetched from the database
+            A dictionary mapping each thread ID to its list of comments, in chronological order
         """
-        with self.connection.cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT id, thread_id, parent_comment_id, username, upvotes, date_posted, text 
-                FROM comments 
-                WHERE thread_id = %s
-                ORDER BY date_posted ASC
-            """,
-                (thread_id,),
-            )
-            comments = [Comment(**row) for row in cursor.fetchall()]
-            return comments
+        comments_by_thread: dict[str, list[Comment]] = defaultdict(list)
+        if not thread_ids:
+            return comments_by_thread
+
+        placeholders = ", ".join(["%s"] * len(thread_ids))
+        self.cursor.execute(
+            f"""
+            SELECT id, thread_id, parent_comment_id, username, upvotes, date_posted, text 
+            FROM comments 
+            WHERE thread_id IN ({placeholders})
+            ORDER BY thread_id, date_posted ASC
+        """,
+            thread_ids,
+        )
+        for row in self.cursor.fetchall():
+            comments_by_thread[row["thread_id"]].append(Comment(**row))
+        return comments_by_thread
+
+
+def _thread_row(thread: Thread) -> tuple:
+    """
+    Returns the values of a thread in the column order of the threads table.
+
+    Args:
+        thread: The thread object
+
+    Returns:
+        A tuple of the thread's column values
+    """
+    return (
+        thread.id,
+        thread.subreddit_id,
+        thread.title,
+        thread.text,
+        thread.external_url,
+        thread.url,
+        thread.username,
+        thread.upvotes,
+        thread.date_posted,
+    )
+
+
+def _comment_row(comment: Comment) -> tuple:
+    """
+    Returns the values of a comment in the column order used by the comment queries.
+
+    Args:
+        comment: The comment object
+
+    Returns:
+        A tuple of the comment's column values
+    """
+    return (
+        comment.id,
+        comment.parent_comment_id,
+        comment.thread_id,
+        comment.username,
+        comment.upvotes,
+        comment.date_posted,
+        comment.text,
+    )
+
+
+def _to_tsv_field(value: object) -> str:
+    """
+    Serializes a value as a field of a LOAD DATA file, using MySQL's default escaping.
+
+    Args:
+        value: The value to serialize
+
+    Returns:
+        The escaped field, or \\N for NULL
+    """
+    if value is None:
+        return "\\N"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
@@ -1,14 +1,7 @@
-from src.data_ingestor import DataIngestor
-from src.database_manager import DatabaseManager
-from src.data_displayer import DataDisplayer
-
 import logging
 import argparse
-import praw
 from datetime import datetime
 
-from src.models import Config
-
 _logger = logging.getLogger(__name__)
 
 
@@ -16,6 +9,21 @@ def main() -> None:
     # Configure logging
     logging.basicConfig(level=logging.INFO)
 
+    # Examine and parse inputs from command line arguments. This runs before the heavy
+    # imports below so that argument errors and --help respond immediately
+    input = _parse_input()
+    _logger.info("Parsing threads from subreddit %s since %s", input[0], input[1])
+    subreddit_name = input[0]
+    date = input[1]
+    max_threads = input[2]
+    expand_comments = input[3]
+
+    import praw
+    from src.data_ingestor import DataIngestor
+    from src.database_manager import DatabaseManager
+    from src.data_displayer import DataDisplayer
+    from src.models import Config
+
     # Load environment variables from .env file
     config = Config()
 
@@ -28,35 +36,38 @@ def main() -> None:
 
     # Use database connection details to initialize database manager
     databaseManager = DatabaseManager(
-        config.DB_HOST, config.DB_USER, config.DB_PASSWORD, config.DB_NAME
+        config.DB_HOST,
+        config.DB_USER,
+        config.DB_PASSWORD,
+        config.DB_NAME,
+        config.DB_BULK_LOAD,
     )
 
     # Initialize our data ingestor and data displayer
     dataIngestor = DataIngestor(reddit)
     dataDisplayer = DataDisplayer(databaseManager)
 
-    # Examine and parse inputs from command line arguments
-    input = _parse_input()
-    _logger.info("Parsing threads from subreddit %s since %s", input[0], input[1])
-    subreddit_name = input[0]
-    date = input[1]
-
     # Ingest data into the database
     dataIngestor.ingest_data_into_database(subreddit_name, date, databaseManager)
 
-    # Display data from the database
-    dataDisplayer.display_subreddit_threads(subreddit_name, date)
+    # Display data from the database, reusing the connection opened for ingestion
+    dataDisplayer.display_subreddit_threads(
+        subreddit_name, date, max_threads, expand_comments
+    )
+    databaseManager.close()
 
 
-def _parse_input() -> tuple[str, datetime]:
+def _parse_input() -> tuple[str, datetime, int | None, bool]:
     """
-    Extracts the subreddit name and date from the command line arguments.
+    Extracts the subreddit name, date and display options from the command line arguments.
 
     Raises:
-        ValueError: If date is invalid (i.e., wrong formatting or is the future)
+        ValueError: If date is invalid (i.e., wrong formatting or is the future) or
+            max_threads is not positive
 
     Returns:
-        A tuple of the subreddit name and date
+        A tuple of the subreddit name, date, maximum number of threads to display
+        and whether to display comments
     """
     # Set command line argument parser
     parser = argparse.ArgumentParser(description="Scrape a subreddit using Reddit API.")
@@ -71,6 +82,16 @@ def _parse_input() -> tuple[str, datetime]:
     group.add_argument(
         "--subreddit_url", type=str, help="URL of the subreddit to scrape"
     )
+    parser.add_argument(
+        "--max_threads",
+        type=int,
+        help="Maximum number of threads to display, most recent first (default: all)",
+    )
+    parser.add_argument(
+        "--expand_comments",
+        action="store_true",
+        help="Display the comments of each thread",
+    )
 
     # Parse command line arguments
     args = parser.parse_args()
@@ -90,7 +111,11 @@ def _parse_input() -> tuple[str, datetime]:
     if datetime_object > datetime.now():
         raise ValueError("Date must be in the past")
 
-    return (subreddit_name, datetime_object)
+    # Determine display options
+    if args.max_threads is not None and args.max_threads < 1:
+        raise ValueError("--max_threads must be a positive number")
+
+    return (subreddit_name, datetime_object, args.max_threads, args.expand_comments)
 
 
 if __name__ == "__main__":
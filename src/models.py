@@ -1,12 +1,28 @@
 from dataclasses import dataclass, field
+from datetime import datetime
 from typing import List, Optional
 from dotenv import load_dotenv
 import os
 
 
+# Environment variables required by Config
+CONFIG_KEYS = (
+    "REDDIT_CLIENT_ID",
+    "REDDIT_SECRET_ID",
+    "USER_AGENT",
+    "DB_HOST",
+    "DB_USER",
+    "DB_PASSWORD",
+    "DB_NAME",
+)
+
+
 class Config:
     def __init__(self):
-        load_dotenv()
+        # load_dotenv never overrides variables that are already set, so the .env lookup
+        # can be skipped entirely when the environment provides all of them
+        if not all(os.getenv(key) for key in CONFIG_KEYS):
+            load_dotenv()
         self.REDDIT_CLIENT_ID: str | None = os.getenv("REDDIT_CLIENT_ID")
         self.REDDIT_SECRET_ID: str | None = os.getenv("REDDIT_SECRET_ID")
         self.USER_AGENT: str | None = os.getenv("USER_AGENT")
@@ -14,9 +30,15 @@ class Config:
         self.DB_USER: str | None = os.getenv("DB_USER")
         self.DB_PASSWORD: str | None = os.getenv("DB_PASSWORD")
         self.DB_NAME: str | None = os.getenv("DB_NAME")
+        # Optional, so it does not decide whether the .env file is read
+        self.DB_BULK_LOAD: bool = os.getenv("DB_BULK_LOAD", "").lower() in (
+            "1",
+            "true",
+            "yes",
+        )
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Comment:
     """
     Represents a Reddit comment.
@@ -27,11 +49,11 @@ class Comment:
     parent_comment_id: str | None
     username: str | None
     upvotes: int
-    date_posted: str
+    date_posted: datetime
     text: str
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Thread:
     """
     Represents a Reddit thread.
@@ -45,11 +67,11 @@ class Thread:
     url: str
     username: Optional[str]
     upvotes: int
-    date_posted: str
+    date_posted: datetime
     comments: List[Comment] = field(default_factory=list)
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Subreddit:
     """
     Represents a Reddit subreddit.
@@ -5,6 +5,12 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Indexes on (table, index name, columns) backing the thread and comment lookups
+INDEXES = [
+    ("threads", "idx_threads_sub_date", "subreddit_id, date_posted"),
+    ("comments", "idx_comments_thread_date", "thread_id, date_posted"),
+]
+
 
 def main():
     logging.basicConfig(level=logging.INFO)
@@ -58,6 +64,7 @@ def create_database_and_tables() -> None:
                 username VARCHAR(255),
                 upvotes INT,
                 date_posted DATETIME,
+                KEY idx_threads_sub_date (subreddit_id, date_posted),
                 FOREIGN KEY (subreddit_id) REFERENCES subreddits(id) ON DELETE CASCADE
             ) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
         """
@@ -74,16 +81,42 @@ def create_database_and_tables() -> None:
                 upvotes INT,
                 date_posted DATETIME,
                 text TEXT,
+                KEY idx_comments_thread_date (thread_id, date_posted),
                 FOREIGN KEY (thread_id) REFERENCES threads(id) ON DELETE CASCADE,
                 FOREIGN KEY (parent_comment_id) REFERENCES comments(id) ON DELETE CASCADE
             ) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
         """
         )
 
+        # Tables created before the indexes were introduced need them added explicitly
+        add_missing_indexes(cursor, config.DB_NAME)
+
         connection.commit()
         logger.info("Database and tables created successfully.")
 
 
+def add_missing_indexes(cursor: pymysql.cursors.Cursor, database_name: str) -> None:
+    """
+    Adds the indexes used by the read queries to existing tables that lack them.
+
+    Args:
+        cursor: Cursor of an open connection to the MySQL server
+        database_name: Name of the database containing the tables
+    """
+    for table, index, columns in INDEXES:
+        cursor.execute(
+            """
+            SELECT 1 FROM information_schema.statistics
+            WHERE table_schema = %s AND table_name = %s AND index_name = %s
+            LIMIT 1
+        """,
+            (database_name, table, index),
+        )
+        if cursor.fetchone() is None:
+            cursor.execute(f"ALTER TABLE {table} ADD INDEX {index} ({columns});")
+            logger.info(f"Added index {index} to table {table}.")
+
+
 # Run the script
 if __name__ == "__main__":
     main()